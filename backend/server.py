@@ -1,15 +1,31 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import os
+from abc import ABC, abstractmethod
 import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 import uuid
-from datetime import datetime, timedelta
+import base64
+import calendar
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 import jwt
 from passlib.context import CryptContext
 import bcrypt
@@ -17,16 +33,175 @@ import bcrypt
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Profiling settings
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 2000))  # 0 disables capture
+SLOW_REQUEST_BUFFER_SIZE = int(os.environ.get('SLOW_REQUEST_BUFFER_SIZE', 50))
+SLOW_REQUEST_SAMPLE_INTERVAL_MS = float(os.environ.get('SLOW_REQUEST_SAMPLE_INTERVAL_MS', 20))
+PROFILE_MAX_SECONDS = int(os.environ.get('PROFILE_MAX_SECONDS', 60))
+MONGO_TRACE_BUFFER_SIZE = int(os.environ.get('MONGO_TRACE_BUFFER_SIZE', 5000))
+
+# Profiling helpers
+def collapse_stack(frame, root: Optional[str] = None) -> str:
+    """Format a frame's call stack root-first, in flamegraph collapsed-stack notation."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    if root is not None:
+        names.append(root)
+    return ";".join(reversed(names))
+
+def format_collapsed(stacks: Counter) -> str:
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+def sample_all_threads(seconds: float, interval: float) -> Counter:
+    """Sample every thread except the caller for `seconds`; blocks the calling thread."""
+    own_ident = threading.get_ident()
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own_ident:
+                stacks[collapse_stack(frame, names.get(ident, str(ident)))] += 1
+        time.sleep(interval)
+    return stacks
+
+class LoopStackSampler:
+    """Continuously samples the event-loop thread into a bounded, timestamped buffer.
+
+    Slow requests look up the samples taken during their lifetime. Samples are
+    attributed by time window, so concurrent requests on the loop share them.
+    """
+
+    def __init__(self, interval: float, window_seconds: float = 120):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=max(1, int(window_seconds / interval)))
+        self.loop_ident: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, loop_ident: int):
+        self.loop_ident = loop_ident
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.loop_ident)
+            if frame is not None:
+                self.samples.append((time.monotonic(), collapse_stack(frame)))
+
+    def collect(self, start: float, end: float) -> Counter:
+        return Counter(stack for ts, stack in list(self.samples) if start <= ts <= end)
+
+class MongoCommandTrace(monitoring.CommandListener):
+    """Keeps the most recent MongoDB commands with their timings in a ring buffer."""
+
+    def __init__(self, maxsize: int):
+        self.commands: deque = deque(maxlen=maxsize)
+        self._pending: Dict[tuple, tuple] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else None
+        self._pending[(event.connection_id, event.request_id)] = (
+            time.monotonic(), event.command_name, event.database_name, collection
+        )
+
+    def _finish(self, event, ok: bool):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        started_at, command_name, database_name, collection = pending
+        self.commands.append({
+            "started_at": started_at,
+            "command": command_name,
+            "database": database_name,
+            "collection": collection,
+            "duration_ms": round(event.duration_micros / 1000, 3),
+            "ok": ok,
+        })
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    def collect(self, start: float, end: float) -> List[dict]:
+        return [
+            {**command, "offset_ms": round((command["started_at"] - start) * 1000, 3)}
+            for command in list(self.commands) if start <= command["started_at"] <= end
+        ]
+
+loop_sampler = LoopStackSampler(SLOW_REQUEST_SAMPLE_INTERVAL_MS / 1000)
+mongo_command_trace = MongoCommandTrace(MONGO_TRACE_BUFFER_SIZE)
+slow_requests: deque = deque(maxlen=SLOW_REQUEST_BUFFER_SIZE)
+profile_lock = asyncio.Lock()
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_trace])
 db = client[os.environ['DB_NAME']]
 
+# Subscription schema settings
+SUBSCRIPTION_SCHEMA_VERSION = 1
+TECHNOLOGY_CODES = {"Starlink": "SL", "VSAT": "VS"}
+FREQUENCY_CODES = {"C-band": "C", "Ku-band": "KU", "Ka-band": "KA"}
+
+# Migration settings
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 500))
+MIGRATION_BATCH_DELAY_SECONDS = float(os.environ.get('MIGRATION_BATCH_DELAY_SECONDS', 0.5))
+MIGRATION_LEASE_SECONDS = int(os.environ.get('MIGRATION_LEASE_SECONDS', 300))
+
 # Security settings
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Audit log settings
+AUDIT_QUEUE_MAXSIZE = int(os.environ.get('AUDIT_QUEUE_MAXSIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get('AUDIT_FLUSH_INTERVAL_SECONDS', 1.0))
+
+# Multi-tenant settings
+TENANT_ID_PATTERN = r"^[a-z0-9_-]{1,64}$"  # tenant ids are also used as directory names
+DEFAULT_TENANT_ID = os.environ.get('DEFAULT_TENANT_ID', 'afrikanet')
+if not re.fullmatch(TENANT_ID_PATTERN, DEFAULT_TENANT_ID):
+    raise RuntimeError(f"DEFAULT_TENANT_ID must match {TENANT_ID_PATTERN}")
+TENANT_STATS_CACHE_TTL_SECONDS = float(os.environ.get('TENANT_STATS_CACHE_TTL_SECONDS', 30))
+TENANT_RATE_LIMIT_PER_MINUTE = int(os.environ.get('TENANT_RATE_LIMIT_PER_MINUTE', 600))
+TENANT_RATE_LIMIT_BURST = int(os.environ.get('TENANT_RATE_LIMIT_BURST', 100))
+
+# Delta sync settings
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 500))
+SYNC_OVERLAP_SECONDS = float(os.environ.get('SYNC_OVERLAP_SECONDS', 5))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Archival settings
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', 24))
+ARCHIVE_LEASE_SECONDS = int(os.environ.get('ARCHIVE_LEASE_SECONDS', 300))
+
+# Dashboard settings: per-section timeouts for the composite endpoint
+DASHBOARD_SECTION_TIMEOUTS = {
+    "stats": float(os.environ.get('DASHBOARD_STATS_TIMEOUT_SECONDS', 3.0)),
+    "alerts": float(os.environ.get('DASHBOARD_ALERTS_TIMEOUT_SECONDS', 2.0)),
+    "revenue_chart": float(os.environ.get('DASHBOARD_CHART_TIMEOUT_SECONDS', 2.0)),
+}
+
+# Report job settings
+REPORTS_DIR = Path(os.environ.get('REPORTS_DIR', ROOT_DIR / 'reports'))
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+REPORT_JOB_LEASE_SECONDS = int(os.environ.get('REPORT_JOB_LEASE_SECONDS', 120))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
@@ -43,6 +218,8 @@ class User(BaseModel):
     email: str
     full_name: str
     hashed_password: str
+    tenant_id: str = DEFAULT_TENANT_ID
+    role: str = "agent"  # "superadmin" (platform operator), "admin" (tenant admin), "agent"
     is_active: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -52,6 +229,10 @@ class UserCreate(BaseModel):
     full_name: str
     password: str
 
+class TenantUserCreate(UserCreate):
+    tenant_id: str = Field(pattern=TENANT_ID_PATTERN)
+    role: Literal["superadmin", "admin", "agent"] = "agent"
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -63,6 +244,7 @@ class Token(BaseModel):
 
 class Subscription(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    tenant_id: str = DEFAULT_TENANT_ID
     client_name: str
     phone: str
     technology: str  # "Starlink" or "VSAT"
@@ -74,7 +256,14 @@ class Subscription(BaseModel):
     start_date: datetime
     end_date: datetime
     status: str = "active"  # "active", "expiring", "expired"
+    technology_code: Optional[str] = None  # "SL", "VS"
+    frequency_code: Optional[str] = None  # "C", "KU", "KA"
+    bandwidth_mbps: Optional[float] = None
+    schema_version: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    archived_at: Optional[datetime] = None
+    restored_at: Optional[datetime] = None
 
 class SubscriptionCreate(BaseModel):
     client_name: str
@@ -89,11 +278,208 @@ class SubscriptionCreate(BaseModel):
 
 class Alert(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    tenant_id: str = DEFAULT_TENANT_ID
     subscription_id: str
     client_name: str
     message: str
     alert_type: str  # "expiring", "expired"
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    archived_at: Optional[datetime] = None
+
+class Tombstone(BaseModel):
+    id: str  # id of the deleted record
+    tenant_id: str = DEFAULT_TENANT_ID
+    collection: str  # "subscriptions", "alerts"
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SubscriptionHistory(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    tenant_id: str = DEFAULT_TENANT_ID
+    subscription_id: str
+    action: str  # "create", "update", "delete", "status", "archive", "restore", "migrate"
+    user_id: str
+    username: str
+    changes: Dict[str, Dict[str, Any]]  # field -> {"old": ..., "new": ...}
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ReportJobCreate(BaseModel):
+    report_type: Literal["technology_export", "revenue_by_frequency", "expiry_forecast"]
+    format: Literal["csv", "xlsx"] = "csv"
+    as_of: Optional[datetime] = None  # defaults to today
+    forecast_months: int = Field(3, ge=1, le=24)  # only used by expiry_forecast
+
+class ReportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    tenant_id: str = DEFAULT_TENANT_ID
+    report_type: str
+    format: str
+    params: Dict[str, Any]
+    params_hash: str
+    status: str = "queued"  # "queued", "running", "done", "failed"
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    # Renewed by the worker running the job; a lapsed lease means that worker died
+    locked_until: datetime = Field(default_factory=lambda: datetime.utcnow() + timedelta(seconds=REPORT_JOB_LEASE_SECONDS))
+
+# Audit log writer
+class AuditLogWriter:
+    """Buffers subscription history entries in memory and writes them in batches.
+
+    Handlers only enqueue (no I/O on the request path); a background task drains
+    the queue with insert_many. When the queue is full the oldest pending entry
+    is dropped to make room, so a stalled database never blocks a request.
+    """
+
+    def __init__(self, collection, maxsize: int, batch_size: int, flush_interval: float):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, entry: SubscriptionHistory):
+        try:
+            self.queue.put_nowait(entry.dict())
+        except asyncio.QueueFull:
+            # Overflow policy: drop the oldest buffered entry, keep the newest
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"Audit queue full, {self.dropped} entries dropped so far")
+            self.queue.put_nowait(entry.dict())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Flush whatever is still buffered before the process exits
+        while not self.queue.empty():
+            await self._write(self._drain())
+
+    def _drain(self, first: Optional[dict] = None) -> List[dict]:
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+            self.queue.task_done()
+        return batch
+
+    async def _write(self, batch: List[dict]):
+        if not batch:
+            return
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} audit entries: {e}")
+
+    async def _run(self):
+        while True:
+            first = await self.queue.get()
+            self.queue.task_done()
+            # Give concurrent writers a moment to fill the batch
+            try:
+                if self.queue.qsize() < self.batch_size - 1:
+                    await asyncio.sleep(self.flush_interval)
+            finally:
+                await self._write(self._drain(first))
+
+audit_log = AuditLogWriter(
+    db.subscription_history,
+    maxsize=AUDIT_QUEUE_MAXSIZE,
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL_SECONDS,
+)
+
+# Bookkeeping fields that change on every write and say nothing about the subscription
+AUDIT_IGNORED_FIELDS = {"_id", "updated_at", "schema_version"}
+
+def diff_documents(old: Optional[dict], new: Optional[dict]) -> Dict[str, Dict[str, Any]]:
+    old = old or {}
+    new = new or {}
+    changes = {}
+    for key in sorted(set(old) | set(new)):
+        if key in AUDIT_IGNORED_FIELDS:
+            continue
+        if old.get(key) != new.get(key):
+            changes[key] = {"old": old.get(key), "new": new.get(key)}
+    return changes
+
+def record_change(tenant_id: str, subscription_id: str, action: str, user_id: str, username: str, old: Optional[dict], new: Optional[dict]):
+    changes = diff_documents(old, new)
+    if action in ("update", "migrate") and not changes:
+        return
+    audit_log.record(SubscriptionHistory(
+        tenant_id=tenant_id,
+        subscription_id=subscription_id,
+        action=action,
+        user_id=user_id,
+        username=username,
+        changes=changes,
+    ))
+
+def record_subscription_change(subscription_id: str, action: str, user: User, old: Optional[dict], new: Optional[dict]):
+    record_change(user.tenant_id, subscription_id, action, user.id, user.username, old, new)
+
+# Tenant isolation
+class TenantScope(BaseModel):
+    tenant_id: str
+    user: User
+
+    def filter(self, query: Optional[dict] = None) -> dict:
+        """Return `query` restricted to this tenant's documents."""
+        return {**(query or {}), "tenant_id": self.tenant_id}
+
+class TenantRateLimiter:
+    """Token bucket per tenant so one large reseller cannot starve the others."""
+
+    def __init__(self, rate_per_minute: int, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._buckets: Dict[str, List[float]] = {}  # tenant_id -> [tokens, last_refill]
+
+    def allow(self, tenant_id: str) -> bool:
+        now = time.monotonic()
+        tokens, last = self._buckets.get(tenant_id, [float(self.burst), now])
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[tenant_id] = [tokens, now]
+        return allowed
+
+class TenantStatsCache:
+    """Short-lived per-tenant cache for the dashboard statistics."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, tuple] = {}  # tenant_id -> (expires_at, stats)
+
+    def get(self, tenant_id: str) -> Optional[dict]:
+        entry = self._entries.get(tenant_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, tenant_id: str, stats: dict):
+        self._entries[tenant_id] = (time.monotonic() + self.ttl, stats)
+
+    def invalidate(self, tenant_id: str):
+        self._entries.pop(tenant_id, None)
+
+tenant_rate_limiter = TenantRateLimiter(TENANT_RATE_LIMIT_PER_MINUTE, TENANT_RATE_LIMIT_BURST)
+tenant_stats_cache = TenantStatsCache(TENANT_STATS_CACHE_TTL_SECONDS)
 
 # Security functions
 def verify_password(plain_password, hashed_password):
@@ -131,9 +517,30 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise credentials_exception
     return User(**user)
 
+async def get_current_tenant(current_user: User = Depends(get_current_user)):
+    if not tenant_rate_limiter.allow(current_user.tenant_id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Request quota exceeded for this organisation",
+        )
+    return TenantScope(tenant_id=current_user.tenant_id, user=current_user)
+
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    """Tenant admin or platform operator; callers must still scope to the admin's tenant."""
+    if current_user.role not in ("admin", "superadmin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
+
+async def get_current_superadmin(current_user: User = Depends(get_current_user)):
+    """Platform operator, for actions that span every tenant or the whole worker."""
+    if current_user.role != "superadmin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Platform operator privileges required")
+    return current_user
+
 # Authentication routes
 @api_router.post("/register", response_model=dict)
-async def register_user(user: UserCreate):
+async def register_user(user: UserCreate, current_admin: User = Depends(get_current_admin)):
+    """Create an agent in the calling admin's tenant; there is no anonymous sign-up."""
     # Check if user already exists
     existing_user = await db.users.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
     if existing_user:
@@ -144,12 +551,31 @@ async def register_user(user: UserCreate):
     user_dict = user.dict()
     del user_dict["password"]
     user_dict["hashed_password"] = hashed_password
+    user_dict["tenant_id"] = current_admin.tenant_id
     
     new_user = User(**user_dict)
     await db.users.insert_one(new_user.dict())
     
     return {"message": "User created successfully"}
 
+@api_router.post("/admin/users", response_model=dict)
+async def create_tenant_user(user: TenantUserCreate, current_admin: User = Depends(get_current_admin)):
+    # Tenant admins manage their own tenant only; platform roles need a platform operator
+    if current_admin.role != "superadmin" and (user.tenant_id != current_admin.tenant_id or user.role == "superadmin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot create users outside your organisation")
+    
+    existing_user = await db.users.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Username or email already registered")
+    
+    user_dict = user.dict()
+    user_dict["hashed_password"] = get_password_hash(user_dict.pop("password"))
+    
+    new_user = User(**user_dict)
+    await db.users.insert_one(new_user.dict())
+    
+    return {"message": "User created successfully", "id": new_user.id}
+
 @api_router.post("/login", response_model=Token)
 async def login_user(user_credentials: UserLogin):
     user = await db.users.find_one({"username": user_credentials.username})
@@ -169,7 +595,9 @@ async def login_user(user_credentials: UserLogin):
         "id": user["id"],
         "username": user["username"],
         "email": user["email"],
-        "full_name": user["full_name"]
+        "full_name": user["full_name"],
+        "tenant_id": user.get("tenant_id", DEFAULT_TENANT_ID),
+        "role": user.get("role", "agent")
     }
     
     return {
@@ -183,31 +611,44 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 # Dashboard routes
-@api_router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    total_subscribers = await db.subscriptions.count_documents({})
-    active_subscriptions = await db.subscriptions.count_documents({"status": "active"})
-    expiring_subscriptions = await db.subscriptions.count_documents({"status": "expiring"})
-    expired_subscriptions = await db.subscriptions.count_documents({"status": "expired"})
+async def compute_dashboard_stats(tenant: TenantScope) -> dict:
+    cached = tenant_stats_cache.get(tenant.tenant_id)
+    if cached is not None:
+        return cached
     
     # Calculate total revenue (sum of all active subscriptions)
     pipeline = [
-        {"$match": {"status": "active"}},
+        {"$match": tenant.filter({"status": "active"})},
         {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
     ]
-    revenue_result = await db.subscriptions.aggregate(pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
     
     # Technology breakdown
     tech_pipeline = [
+        {"$match": tenant.filter()},
         {"$group": {"_id": "$technology", "count": {"$sum": 1}}}
     ]
-    tech_breakdown = await db.subscriptions.aggregate(tech_pipeline).to_list(10)
     
-    # Alerts count
-    alerts_count = await db.alerts.count_documents({})
+    # The queries are independent, so issue them concurrently
+    (
+        total_subscribers,
+        active_subscriptions,
+        expiring_subscriptions,
+        expired_subscriptions,
+        revenue_result,
+        tech_breakdown,
+        alerts_count,
+    ) = await asyncio.gather(
+        db.subscriptions.count_documents(tenant.filter()),
+        db.subscriptions.count_documents(tenant.filter({"status": "active"})),
+        db.subscriptions.count_documents(tenant.filter({"status": "expiring"})),
+        db.subscriptions.count_documents(tenant.filter({"status": "expired"})),
+        db.subscriptions.aggregate(pipeline).to_list(1),
+        db.subscriptions.aggregate(tech_pipeline).to_list(10),
+        db.alerts.count_documents(tenant.filter()),
+    )
+    total_revenue = revenue_result[0]["total"] if revenue_result else 0
     
-    return {
+    stats = {
         "total_subscribers": total_subscribers,
         "monthly_revenue": total_revenue,
         "active_subscriptions": active_subscriptions,
@@ -219,33 +660,150 @@ async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
             "expired": expired_subscriptions
         }
     }
+    tenant_stats_cache.set(tenant.tenant_id, stats)
+    return stats
 
-@api_router.get("/dashboard/revenue-chart")
-async def get_revenue_chart(current_user: User = Depends(get_current_user)):
+async def compute_revenue_chart(tenant: TenantScope) -> dict:
     # Mock data for revenue chart - in real implementation, aggregate by month
     return {
         "labels": ["Jan", "Fév", "Mars", "Avr", "Mai", "Juin"],
         "data": [42000000, 45000000, 43500000, 46800000, 45200000, 47500000]
     }
 
+async def fetch_recent_alerts(tenant: TenantScope, limit: int) -> List[Alert]:
+    alerts = await db.alerts.find(tenant.filter()).sort("created_at", -1).to_list(limit)
+    return [Alert(**alert) for alert in alerts]
+
+@api_router.get("/dashboard/stats")
+async def get_dashboard_stats(tenant: TenantScope = Depends(get_current_tenant)):
+    return await compute_dashboard_stats(tenant)
+
+@api_router.get("/dashboard/revenue-chart")
+async def get_revenue_chart(tenant: TenantScope = Depends(get_current_tenant)):
+    return await compute_revenue_chart(tenant)
+
+async def run_dashboard_section(name: str, coro, timeout: float):
+    try:
+        return name, await asyncio.wait_for(coro, timeout), None
+    except asyncio.TimeoutError:
+        logger.warning(f"Dashboard section '{name}' timed out after {timeout}s")
+        return name, None, "timeout"
+    except Exception as e:
+        logger.error(f"Dashboard section '{name}' failed: {e}")
+        return name, None, "error"
+
+@api_router.get("/dashboard")
+async def get_dashboard(
+    fields: str = Query(",".join(DASHBOARD_SECTION_TIMEOUTS), description="Comma-separated sections to return"),
+    alerts_limit: int = Query(3, ge=1, le=100),
+    tenant: TenantScope = Depends(get_current_tenant)
+):
+    """Return several dashboard sections in one round trip.
+
+    Sections are computed concurrently, each under its own timeout. A section that
+    fails or times out comes back as null with its reason listed in `errors`.
+    """
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in DASHBOARD_SECTION_TIMEOUTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dashboard sections: {', '.join(unknown)}")
+    
+    builders = {
+        "stats": lambda: compute_dashboard_stats(tenant),
+        "alerts": lambda: fetch_recent_alerts(tenant, alerts_limit),
+        "revenue_chart": lambda: compute_revenue_chart(tenant),
+    }
+    results = await asyncio.gather(*[
+        run_dashboard_section(name, builders[name](), DASHBOARD_SECTION_TIMEOUTS[name])
+        for name in dict.fromkeys(requested)
+    ])
+    
+    response = {"errors": {}}
+    for name, value, error in results:
+        response[name] = value
+        if error is not None:
+            response["errors"][name] = error
+    return response
+
+# Subscription field normalisation
+def add_months(value: datetime, months: int) -> datetime:
+    """Add calendar months, clamping the day to the end of shorter months."""
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+def normalise_choice(value: str, choices: Dict[str, str]) -> tuple:
+    """Match free text against the known values, returning (canonical value, code)."""
+    key = re.sub(r"[\s_-]", "", value or "").lower()
+    for canonical, code in choices.items():
+        if re.sub(r"[\s_-]", "", canonical).lower() == key:
+            return canonical, code
+    return value, None
+
+BANDWIDTH_UNITS_MBPS = {"k": 0.001, "m": 1.0, "g": 1000.0}
+
+def parse_bandwidth_mbps(value: str) -> Optional[float]:
+    """Parse a bit rate such as "100Mbps" or "2.5 Gbit/s" into megabits per second.
+
+    Only unambiguous bit rates are parsed; anything else (a bare number, or a
+    byte rate such as "100 MBps") returns None rather than a guess.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:[.,]\d+)?)\s*([kKmMgG])\s*b(?:its?)?\s*(?:ps|/s)\s*", value or "")
+    if match is None:
+        return None
+    amount = float(match.group(1).replace(",", "."))
+    return amount * BANDWIDTH_UNITS_MBPS[match.group(2).lower()]
+
+def normalise_subscription_fields(subscription: dict) -> dict:
+    """Return the derived fields for the current subscription schema version."""
+    technology, technology_code = normalise_choice(subscription["technology"], TECHNOLOGY_CODES)
+    frequency, frequency_code = normalise_choice(subscription["frequency"], FREQUENCY_CODES)
+    bandwidth_mbps = parse_bandwidth_mbps(subscription["bandwidth"])
+    return {
+        "technology": technology,
+        "technology_code": technology_code,
+        "frequency": frequency,
+        "frequency_code": frequency_code,
+        "bandwidth_mbps": bandwidth_mbps,
+        "end_date": add_months(subscription["start_date"], subscription["duration_months"]),
+        "schema_version": SUBSCRIPTION_SCHEMA_VERSION,
+    }
+
+def derive_subscription_status(end_date: datetime, now: Optional[datetime] = None) -> str:
+    """Status for `end_date`, using the same thresholds as update_subscription_statuses."""
+    now = now or datetime.utcnow()
+    if end_date <= now:
+        return "expired"
+    if end_date <= now + timedelta(days=30):
+        return "expiring"
+    return "active"
+
 # Subscription routes
 @api_router.get("/subscriptions", response_model=List[Subscription])
-async def get_subscriptions(current_user: User = Depends(get_current_user)):
+async def get_subscriptions(
+    include_archived: bool = False,
+    tenant: TenantScope = Depends(get_current_tenant)
+):
     # Update subscription statuses first
-    await update_subscription_statuses()
-    subscriptions = await db.subscriptions.find().to_list(1000)
+    await update_subscription_statuses(tenant.tenant_id)
+    subscriptions = await db.subscriptions.find(tenant.filter()).to_list(1000)
+    if include_archived:
+        subscriptions += await db.subscriptions_archive.find(tenant.filter()).to_list(1000)
     return [Subscription(**sub) for sub in subscriptions]
 
 @api_router.post("/subscriptions", response_model=Subscription)
-async def create_subscription(subscription: SubscriptionCreate, current_user: User = Depends(get_current_user)):
-    # Calculate end date
-    end_date = subscription.start_date + timedelta(days=subscription.duration_months * 30)
-    
+async def create_subscription(subscription: SubscriptionCreate, tenant: TenantScope = Depends(get_current_tenant)):
+    # Calculate end date and the normalised codes
     subscription_dict = subscription.dict()
-    subscription_dict["end_date"] = end_date
+    subscription_dict.update(normalise_subscription_fields(subscription_dict))
+    subscription_dict["tenant_id"] = tenant.tenant_id
     
     new_subscription = Subscription(**subscription_dict)
     await db.subscriptions.insert_one(new_subscription.dict())
+    record_subscription_change(new_subscription.id, "create", tenant.user, None, new_subscription.dict())
+    tenant_stats_cache.invalidate(tenant.tenant_id)
     
     return new_subscription
 
@@ -253,63 +811,181 @@ async def create_subscription(subscription: SubscriptionCreate, current_user: Us
 async def update_subscription(
     subscription_id: str, 
     subscription: SubscriptionCreate, 
-    current_user: User = Depends(get_current_user)
+    tenant: TenantScope = Depends(get_current_tenant)
 ):
-    end_date = subscription.start_date + timedelta(days=subscription.duration_months * 30)
     subscription_dict = subscription.dict()
-    subscription_dict["end_date"] = end_date
+    subscription_dict.update(normalise_subscription_fields(subscription_dict))
+    subscription_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.subscriptions.update_one(
-        {"id": subscription_id}, 
-        {"$set": subscription_dict}
+    # Fetch the previous version in the same round trip so the change can be audited
+    previous = await db.subscriptions.find_one_and_update(
+        tenant.filter({"id": subscription_id}), 
+        {"$set": subscription_dict},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Subscription not found")
     
-    updated_subscription = await db.subscriptions.find_one({"id": subscription_id})
+    updated_subscription = {**previous, **subscription_dict}
+    record_subscription_change(subscription_id, "update", tenant.user, previous, updated_subscription)
+    tenant_stats_cache.invalidate(tenant.tenant_id)
     return Subscription(**updated_subscription)
 
 @api_router.delete("/subscriptions/{subscription_id}")
-async def delete_subscription(subscription_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.subscriptions.delete_one({"id": subscription_id})
-    if result.deleted_count == 0:
+async def delete_subscription(subscription_id: str, tenant: TenantScope = Depends(get_current_tenant)):
+    deleted = await db.subscriptions.find_one_and_delete(tenant.filter({"id": subscription_id}))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Subscription not found")
     
+    await db.tombstones.insert_one(
+        Tombstone(id=subscription_id, tenant_id=tenant.tenant_id, collection="subscriptions").dict()
+    )
+    record_subscription_change(subscription_id, "delete", tenant.user, deleted, None)
+    tenant_stats_cache.invalidate(tenant.tenant_id)
     return {"message": "Subscription deleted successfully"}
 
+@api_router.get("/subscriptions/{subscription_id}/history", response_model=List[SubscriptionHistory])
+async def get_subscription_history(
+    subscription_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    tenant: TenantScope = Depends(get_current_tenant)
+):
+    entries = await db.subscription_history.find(
+        tenant.filter({"subscription_id": subscription_id})
+    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    return [SubscriptionHistory(**entry) for entry in entries]
+
 # Alerts routes
 @api_router.get("/alerts", response_model=List[Alert])
-async def get_alerts(current_user: User = Depends(get_current_user)):
-    alerts = await db.alerts.find().sort("created_at", -1).to_list(100)
-    return [Alert(**alert) for alert in alerts]
+async def get_alerts(
+    include_archived: bool = False,
+    tenant: TenantScope = Depends(get_current_tenant)
+):
+    alerts = await fetch_recent_alerts(tenant, 100)
+    if include_archived:
+        archived = await db.alerts_archive.find(tenant.filter()).sort("created_at", -1).to_list(100)
+        alerts += [Alert(**alert) for alert in archived]
+    return alerts
+
+# Delta sync routes
+SYNC_EPOCH = datetime(1970, 1, 1)
+SYNC_SOURCES = {"s": "subscriptions", "a": "alerts", "t": "tombstones"}
+
+def encode_sync_token(cursors: Dict[str, tuple]) -> str:
+    payload = {key: [ts.isoformat(), record_id] for key, (ts, record_id) in cursors.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+def decode_sync_token(token: Optional[str]) -> Dict[str, tuple]:
+    if not token:
+        return {key: (SYNC_EPOCH, "") for key in SYNC_SOURCES}
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        cursors = {key: (datetime.fromisoformat(payload[key][0]), payload[key][1]) for key in SYNC_SOURCES}
+    except (ValueError, KeyError, TypeError, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    # Tokens we issue hold naive UTC; an offset would break comparisons with stored dates
+    if any(ts.tzinfo is not None for ts, _ in cursors.values()):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return cursors
+
+async def fetch_changes(collection, tenant: TenantScope, cursor: tuple, limit: int):
+    """Return up to `limit` records changed after `cursor`, in (updated_at, id) order."""
+    since, last_id = cursor
+    query = tenant.filter({"$or": [
+        {"updated_at": {"$gt": since}},
+        {"updated_at": since, "id": {"$gt": last_id}},
+    ]})
+    docs = await collection.find(query, {"_id": 0}).sort([("updated_at", 1), ("id", 1)]).to_list(limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = (docs[-1]["updated_at"], docs[-1]["id"]) if docs else cursor
+    if not has_more:
+        # Caught up: rewind slightly so writes that committed late with an older
+        # updated_at are picked up next time. Clients apply deltas idempotently.
+        overlap = datetime.utcnow() - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        if not docs or next_cursor[0] > overlap:
+            next_cursor = (max(overlap, since), "")
+    return docs, next_cursor, has_more
+
+@api_router.get("/sync")
+async def sync_changes(
+    token: Optional[str] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=5000),
+    tenant: TenantScope = Depends(get_current_tenant)
+):
+    cursors = decode_sync_token(token)
+    
+    # Tombstones are pruned after the retention period, so older tokens need a full resync
+    reset = token is not None and \
+        cursors["t"][0] < datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    full_sync = reset or token is None
+    if full_sync:
+        cursors = decode_sync_token(None)
+        # A fresh cache has nothing to delete; only track deletions from now on
+        cursors["t"] = (datetime.utcnow() - timedelta(seconds=SYNC_OVERLAP_SECONDS), "")
+    
+    await update_subscription_statuses(tenant.tenant_id)
+    
+    subscriptions, cursors["s"], subs_more = await fetch_changes(db.subscriptions, tenant, cursors["s"], limit)
+    alerts, cursors["a"], alerts_more = await fetch_changes(db.alerts, tenant, cursors["a"], limit)
+    tombstones, cursors["t"], tombstones_more = await fetch_changes(db.tombstones, tenant, cursors["t"], limit)
+    
+    return {
+        "reset": full_sync,
+        "subscriptions": {
+            "upserted": [Subscription(**sub) for sub in subscriptions],
+            "deleted": [t["id"] for t in tombstones if t["collection"] == "subscriptions"],
+        },
+        "alerts": {
+            "upserted": [Alert(**alert) for alert in alerts],
+            "deleted": [t["id"] for t in tombstones if t["collection"] == "alerts"],
+        },
+        "has_more": subs_more or alerts_more or tombstones_more,
+        "sync_token": encode_sync_token(cursors),
+    }
 
 # Utility function to update subscription statuses
-async def update_subscription_statuses():
+async def update_subscription_statuses(tenant_id: Optional[str] = None):
+    """Refresh statuses for one tenant, or for every tenant when tenant_id is None."""
     now = datetime.utcnow()
     expiry_threshold = now + timedelta(days=30)  # 30 days before expiry
+    scope = {"tenant_id": tenant_id} if tenant_id is not None else {}
     
-    # Mark as expiring (30 days before expiry)
-    await db.subscriptions.update_many(
-        {"end_date": {"$lte": expiry_threshold, "$gt": now}, "status": "active"},
-        {"$set": {"status": "expiring"}}
-    )
-    
-    # Mark as expired
-    await db.subscriptions.update_many(
-        {"end_date": {"$lte": now}, "status": {"$in": ["active", "expiring"]}},
-        {"$set": {"status": "expired"}}
-    )
+    transitions = [
+        # Mark as expiring (30 days before expiry)
+        ({**scope, "end_date": {"$lte": expiry_threshold, "$gt": now}, "status": "active"}, "expiring"),
+        # Mark as expired
+        ({**scope, "end_date": {"$lte": now}, "status": {"$in": ["active", "expiring"]}}, "expired"),
+    ]
+    for query, new_status in transitions:
+        # One document at a time so that, when sweeps overlap, each transition is audited exactly once
+        while True:
+            previous = await db.subscriptions.find_one_and_update(
+                query,
+                {"$set": {"status": new_status, "updated_at": now}},
+                projection={"id": 1, "tenant_id": 1, "status": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous is None:
+                break
+            record_change(
+                previous["tenant_id"], previous["id"], "status", "system", "status-sweep",
+                {"status": previous["status"]}, {"status": new_status}
+            )
     
     # Generate alerts for expiring subscriptions
-    expiring_subs = await db.subscriptions.find({"status": "expiring"}).to_list(1000)
+    expiring_subs = await db.subscriptions.find({**scope, "status": "expiring"}).to_list(1000)
     for sub in expiring_subs:
         existing_alert = await db.alerts.find_one({
+            "tenant_id": sub["tenant_id"],
             "subscription_id": sub["id"], 
             "alert_type": "expiring"
         })
         if not existing_alert:
             alert = Alert(
+                tenant_id=sub["tenant_id"],
                 subscription_id=sub["id"],
                 client_name=sub["client_name"],
                 message=f"Abonnement {sub['plan']} ({sub['frequency']}) expire le {sub['end_date'].strftime('%d/%m/%Y')}",
@@ -317,11 +993,696 @@ async def update_subscription_statuses():
             )
             await db.alerts.insert_one(alert.dict())
 
+# Report jobs
+REPORT_COLUMNS = [
+    "client_name", "phone", "technology", "plan", "bandwidth", "frequency",
+    "amount", "status", "start_date", "end_date",
+]
+
+def excel_sheet_name(name: str, taken: set) -> str:
+    """Make `name` a valid sheet title that is not already in `taken` (case-insensitive)."""
+    base = re.sub(r"[\[\]:*?/\\]", "_", name).strip("'")[:31] or "Feuille"
+    candidate = base
+    suffix = 2
+    while candidate.lower() in taken:
+        tail = f" ({suffix})"
+        candidate = base[:31 - len(tail)] + tail
+        suffix += 1
+    taken.add(candidate.lower())
+    return candidate
+
+def build_report(report_type: str, fmt: str, params: dict, records: List[dict], output_path: str):
+    """Render a report with pandas and write it to `output_path`.
+
+    Runs in the report process pool, so it must stay a picklable module-level
+    function and must not touch the database or the event loop.
+    """
+    import pandas as pd
+    
+    df = pd.DataFrame(records, columns=REPORT_COLUMNS)
+    for column in ("start_date", "end_date"):
+        df[column] = pd.to_datetime(df[column])
+    sheets = {}
+    if report_type == "technology_export":
+        df = df.sort_values(["technology", "client_name"])
+        sheets["Tous"] = df
+        taken = {"tous"}
+        for technology, group in df.groupby("technology"):
+            sheets[excel_sheet_name(str(technology), taken)] = group
+    elif report_type == "revenue_by_frequency":
+        billed = df[df["status"].isin(["active", "expiring"])]
+        sheets["Revenus"] = billed.groupby("frequency").agg(
+            subscribers=("client_name", "count"),
+            total_amount=("amount", "sum"),
+            average_amount=("amount", "mean"),
+        ).reset_index()
+    elif report_type == "expiry_forecast":
+        as_of = pd.Timestamp(params["as_of"])
+        horizon = as_of + pd.DateOffset(months=params["forecast_months"])
+        expiring = df[(df["end_date"] >= as_of) & (df["end_date"] < horizon)].copy()
+        expiring["month"] = expiring["end_date"].dt.to_period("M").astype(str)
+        sheets["Prévisions"] = expiring.groupby(["month", "technology"]).agg(
+            subscriptions=("client_name", "count"),
+            amount_at_risk=("amount", "sum"),
+        ).reset_index()
+    else:
+        raise ValueError(f"Unknown report type: {report_type}")
+    
+    tmp_path = f"{output_path}.partial.{fmt}"
+    try:
+        if fmt == "xlsx":
+            with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+                for name, sheet in sheets.items():
+                    sheet.to_excel(writer, sheet_name=name, index=False)
+        else:
+            next(iter(sheets.values())).to_csv(tmp_path, index=False)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # Publish atomically so a download never sees a half-written file
+    os.replace(tmp_path, output_path)
+
+def report_path(job: dict) -> Path:
+    if not re.fullmatch(TENANT_ID_PATTERN, job["tenant_id"]):
+        raise ValueError(f"Invalid tenant id for report path: {job['tenant_id']!r}")
+    return REPORTS_DIR / job["tenant_id"] / f"{job['params_hash']}.{job['format']}"
+
+report_pool: Optional[ProcessPoolExecutor] = None
+report_tasks: set = set()
+
+async def renew_report_lease(job_id: str):
+    while True:
+        await asyncio.sleep(REPORT_JOB_LEASE_SECONDS / 3)
+        await db.report_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=REPORT_JOB_LEASE_SECONDS)}}
+        )
+
+async def run_report_job(job: dict):
+    await db.report_jobs.update_one({"id": job["id"]}, {"$set": {"status": "running"}})
+    heartbeat = asyncio.create_task(renew_report_lease(job["id"]))
+    try:
+        records = await db.subscriptions.find(
+            {"tenant_id": job["tenant_id"]}, {"_id": 0, **{column: 1 for column in REPORT_COLUMNS}}
+        ).to_list(None)
+        output_path = report_path(job)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            report_pool, build_report,
+            job["report_type"], job["format"], job["params"], records, str(output_path)
+        )
+        update = {"status": "done"}
+    except Exception as e:
+        logger.error(f"Report job {job['id']} failed: {e}")
+        update = {"status": "failed", "error": str(e)}
+    finally:
+        heartbeat.cancel()
+    update["finished_at"] = datetime.utcnow()
+    await db.report_jobs.update_one({"id": job["id"]}, {"$set": update})
+
+@api_router.post("/reports", response_model=ReportJob, status_code=status.HTTP_202_ACCEPTED)
+async def submit_report(request: ReportJobCreate, tenant: TenantScope = Depends(get_current_tenant)):
+    as_of = request.as_of or datetime.utcnow()
+    if as_of.tzinfo is not None:
+        # Stored dates are naive UTC; an aware as_of cannot be compared with them
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    as_of = as_of.replace(hour=0, minute=0, second=0, microsecond=0)
+    params = {"as_of": as_of.isoformat()}
+    if request.report_type == "expiry_forecast":
+        params["forecast_months"] = request.forecast_months
+    params_hash = hashlib.sha256(json.dumps(
+        [tenant.tenant_id, request.report_type, request.format, params], sort_keys=True
+    ).encode()).hexdigest()
+    
+    # Identical requests reuse a live pending job, or a finished one whose file is still on disk
+    existing = await db.report_jobs.find_one(
+        tenant.filter({"params_hash": params_hash, "status": {"$in": ["queued", "running", "done"]}}),
+        sort=[("created_at", -1)]
+    )
+    if existing and (
+        report_path(existing).exists() if existing["status"] == "done"
+        else existing.get("locked_until") and existing["locked_until"] > datetime.utcnow()
+    ):
+        return ReportJob(**existing)
+    
+    job = ReportJob(
+        tenant_id=tenant.tenant_id,
+        report_type=request.report_type,
+        format=request.format,
+        params=params,
+        params_hash=params_hash,
+        created_by=tenant.user.username,
+    )
+    await db.report_jobs.insert_one(job.dict())
+    
+    task = asyncio.create_task(run_report_job(job.dict()))
+    report_tasks.add(task)
+    task.add_done_callback(report_tasks.discard)
+    return job
+
+@api_router.get("/reports/{job_id}", response_model=ReportJob)
+async def get_report_job(job_id: str, tenant: TenantScope = Depends(get_current_tenant)):
+    job = await db.report_jobs.find_one(tenant.filter({"id": job_id}))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return ReportJob(**job)
+
+@api_router.get("/reports/{job_id}/download")
+async def download_report(job_id: str, tenant: TenantScope = Depends(get_current_tenant)):
+    job = await db.report_jobs.find_one(tenant.filter({"id": job_id}))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Report is not ready (status: {job['status']})")
+    
+    path = report_path(job)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Report file is no longer available, please resubmit")
+    media_types = {
+        "csv": "text/csv",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+    filename = f"{job['report_type']}_{job['params']['as_of'][:10]}.{job['format']}"
+    return FileResponse(path, media_type=media_types[job["format"]], filename=filename)
+
+# Archival of long-expired subscriptions
+archive_metrics = {
+    "last_run_at": None,
+    "last_run_subscriptions": 0,
+    "last_run_alerts": 0,
+}
+
+async def move_documents(source, target, docs: List[dict], archived_at: Optional[datetime]) -> List[dict]:
+    """Copy `docs` into `target` then remove them from `source`, in batched bulk writes.
+
+    The copy is an upsert keyed on (tenant_id, id), so a run interrupted between
+    the two steps can simply be repeated. A source document edited since it was
+    read is left in place and its stale copy withdrawn from `target`. Returns the
+    documents actually moved.
+    """
+    if not docs:
+        return []
+    upserts = []
+    for doc in docs:
+        doc = {key: value for key, value in doc.items() if key != "_id"}
+        doc["archived_at"] = archived_at
+        if archived_at is None:
+            doc["updated_at"] = doc["restored_at"] = datetime.utcnow()
+        upserts.append(ReplaceOne({"tenant_id": doc["tenant_id"], "id": doc["id"]}, doc, upsert=True))
+    await target.bulk_write(upserts, ordered=False)
+    await source.bulk_write(
+        [DeleteOne({"_id": doc["_id"], "updated_at": doc.get("updated_at")}) for doc in docs],
+        ordered=False
+    )
+    
+    remaining = await source.find({"_id": {"$in": [doc["_id"] for doc in docs]}}, {"_id": 1}).to_list(None)
+    remaining_ids = {doc["_id"] for doc in remaining}
+    changed = [doc for doc in docs if doc["_id"] in remaining_ids]
+    if changed:
+        await target.bulk_write([
+            DeleteOne({"tenant_id": doc["tenant_id"], "id": doc["id"]}) for doc in changed
+        ], ordered=False)
+    return [doc for doc in docs if doc["_id"] not in remaining_ids]
+
+# Identifies this worker process as the holder of an archive run lease
+ARCHIVE_WORKER_ID = str(uuid.uuid4())
+
+async def claim_archive_run(min_interval: timedelta) -> bool:
+    """Take the archive lease unless another worker holds it or a run finished within `min_interval`."""
+    now = datetime.utcnow()
+    try:
+        await db.archive_runs.find_one_and_update(
+            {
+                "id": "archive",
+                "locked_until": {"$not": {"$gte": now}},
+                "finished_at": {"$not": {"$gte": now - min_interval}},
+            },
+            {"$set": {"owner": ARCHIVE_WORKER_ID, "locked_until": now + timedelta(seconds=ARCHIVE_LEASE_SECONDS), "started_at": now}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The record exists but is leased or recent, so the upsert collided
+        return False
+
+async def renew_archive_lease():
+    await db.archive_runs.update_one(
+        {"id": "archive", "owner": ARCHIVE_WORKER_ID},
+        {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=ARCHIVE_LEASE_SECONDS)}}
+    )
+
+async def release_archive_lease():
+    await db.archive_runs.update_one(
+        {"id": "archive", "owner": ARCHIVE_WORKER_ID},
+        {"$set": {"locked_until": None, "finished_at": datetime.utcnow()}}
+    )
+
+async def archive_tenant_subscriptions(tenant_id: str, cutoff: datetime) -> tuple:
+    archived_subs = 0
+    archived_alerts = 0
+    # Subscriptions restored since the cutoff are left in place
+    query = {
+        "tenant_id": tenant_id,
+        "status": "expired",
+        "end_date": {"$lt": cutoff},
+        # Matches missing and null too, so never-restored subscriptions qualify
+        "restored_at": {"$not": {"$gte": cutoff}},
+    }
+    last_id = None
+    while True:
+        # Advance by _id so subscriptions skipped because they were edited are not retried in this run
+        batch_query = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+        batch = await db.subscriptions.find(batch_query).sort("_id", 1).to_list(ARCHIVE_BATCH_SIZE)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        now = datetime.utcnow()
+        
+        moved = await move_documents(db.subscriptions, db.subscriptions_archive, batch, now)
+        subscription_ids = [sub["id"] for sub in moved]
+        alerts = []
+        if subscription_ids:
+            alerts = await db.alerts.find(
+                {"tenant_id": tenant_id, "subscription_id": {"$in": subscription_ids}}
+            ).to_list(None)
+        alerts = await move_documents(db.alerts, db.alerts_archive, alerts, now)
+        
+        # Let sync clients drop the records from their working set
+        tombstones = [Tombstone(id=sub_id, tenant_id=tenant_id, collection="subscriptions").dict() for sub_id in subscription_ids]
+        tombstones += [Tombstone(id=alert["id"], tenant_id=tenant_id, collection="alerts").dict() for alert in alerts]
+        if tombstones:
+            await db.tombstones.insert_many(tombstones)
+        
+        for sub in moved:
+            record_change(tenant_id, sub["id"], "archive", "system", "archiver", sub, {**sub, "archived_at": now})
+        
+        archived_subs += len(moved)
+        archived_alerts += len(alerts)
+        await renew_archive_lease()
+        # Yield between batches so the archive run does not monopolise the database
+        await asyncio.sleep(0.1)
+    
+    if archived_subs:
+        tenant_stats_cache.invalidate(tenant_id)
+    return archived_subs, archived_alerts
+
+async def archive_expired_subscriptions(older_than_days: int = ARCHIVE_AFTER_DAYS) -> dict:
+    """Run one archive pass; the caller must hold the archive lease."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived_subs = 0
+    archived_alerts = 0
+    # Run tenant by tenant so every query can use the tenant-prefixed indexes
+    for tenant_id in await db.subscriptions.distinct("tenant_id"):
+        subs, alerts = await archive_tenant_subscriptions(tenant_id, cutoff)
+        archived_subs += subs
+        archived_alerts += alerts
+    
+    archive_metrics.update({
+        "last_run_at": datetime.utcnow(),
+        "last_run_subscriptions": archived_subs,
+        "last_run_alerts": archived_alerts,
+    })
+    logger.info(f"Archived {archived_subs} subscriptions and {archived_alerts} alerts expired before {cutoff:%Y-%m-%d}")
+    return {"archived_subscriptions": archived_subs, "archived_alerts": archived_alerts}
+
+async def run_archive_loop():
+    # Every worker polls, but the lease lets only one of them run a pass per interval
+    interval = timedelta(hours=ARCHIVE_INTERVAL_HOURS)
+    poll_seconds = min(ARCHIVE_INTERVAL_HOURS * 3600, ARCHIVE_LEASE_SECONDS)
+    while True:
+        try:
+            if await claim_archive_run(interval):
+                try:
+                    await archive_expired_subscriptions()
+                finally:
+                    await release_archive_lease()
+        except Exception as e:
+            logger.error(f"Archive run failed: {e}")
+        await asyncio.sleep(poll_seconds)
+
+archive_task: Optional[asyncio.Task] = None
+
+@api_router.post("/admin/archive")
+async def trigger_archive(
+    older_than_days: int = Query(ARCHIVE_AFTER_DAYS, ge=0),
+    current_admin: User = Depends(get_current_superadmin)
+):
+    if not await claim_archive_run(timedelta(0)):
+        raise HTTPException(status_code=409, detail="An archive run is already in progress")
+    try:
+        return await archive_expired_subscriptions(older_than_days)
+    finally:
+        await release_archive_lease()
+
+@api_router.get("/admin/archive/metrics")
+async def get_archive_metrics(current_admin: User = Depends(get_current_superadmin)):
+    return {
+        "working_set": {
+            "subscriptions": await db.subscriptions.estimated_document_count(),
+            "alerts": await db.alerts.estimated_document_count(),
+        },
+        "archive": {
+            "subscriptions": await db.subscriptions_archive.estimated_document_count(),
+            "alerts": await db.alerts_archive.estimated_document_count(),
+        },
+        **archive_metrics,
+    }
+
+@api_router.post("/subscriptions/{subscription_id}/restore", response_model=Subscription)
+async def restore_subscription(subscription_id: str, tenant: TenantScope = Depends(get_current_tenant)):
+    archived = await db.subscriptions_archive.find_one(tenant.filter({"id": subscription_id}))
+    if archived is None:
+        raise HTTPException(status_code=404, detail="Archived subscription not found")
+    
+    if not await move_documents(db.subscriptions_archive, db.subscriptions, [archived], None):
+        raise HTTPException(status_code=409, detail="Subscription changed while being restored, please retry")
+    alerts = await db.alerts_archive.find(tenant.filter({"subscription_id": subscription_id})).to_list(None)
+    alerts = await move_documents(db.alerts_archive, db.alerts, alerts, None)
+    # Drop the archive tombstones so clients that have not synced yet keep the record
+    await db.tombstones.delete_many(tenant.filter({
+        "id": {"$in": [subscription_id] + [alert["id"] for alert in alerts]}
+    }))
+    tenant_stats_cache.invalidate(tenant.tenant_id)
+    
+    restored = await db.subscriptions.find_one(tenant.filter({"id": subscription_id}))
+    record_subscription_change(subscription_id, "restore", tenant.user, archived, restored)
+    return Subscription(**restored)
+
+# Profiling routes
+@api_router.get("/admin/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    current_admin: User = Depends(get_current_superadmin)
+):
+    """Sample every thread of this worker for `seconds` and return collapsed stacks."""
+    if seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {PROFILE_MAX_SECONDS}")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    async with profile_lock:
+        stacks = await asyncio.to_thread(sample_all_threads, seconds, interval_ms / 1000)
+    return format_collapsed(stacks)
+
+@api_router.get("/admin/slow-requests")
+async def list_slow_requests(current_admin: User = Depends(get_current_superadmin)):
+    return [
+        {key: value for key, value in capture.items() if key not in ("stacks", "mongo_commands")}
+        for capture in reversed(slow_requests)
+    ]
+
+@api_router.get("/admin/slow-requests/{capture_id}")
+async def get_slow_request(capture_id: str, current_admin: User = Depends(get_current_superadmin)):
+    for capture in slow_requests:
+        if capture["id"] == capture_id:
+            return capture
+    raise HTTPException(status_code=404, detail="Slow request capture not found")
+
+@api_router.get("/admin/slow-requests/{capture_id}/stacks", response_class=PlainTextResponse)
+async def get_slow_request_stacks(capture_id: str, current_admin: User = Depends(get_current_superadmin)):
+    capture = await get_slow_request(capture_id, current_admin)
+    return capture["stacks"]
+
+# Online data migrations
+class Migration(ABC):
+    """A versioned rewrite of subscription documents, applied batch by batch.
+
+    Subclasses set `id` and `target_version` and implement `transform`, which
+    returns the fields to $set on a document (or None to leave it untouched).
+    """
+    id: str
+    description: str
+    target_version: int
+    collections = ("subscriptions", "subscriptions_archive")
+
+    @abstractmethod
+    def transform(self, doc: dict) -> Optional[dict]:
+        ...
+
+class CalendarMonthsAndCodesMigration(Migration):
+    id = "0001_calendar_months_and_codes"
+    description = "Compute end_date in calendar months and normalise technology, frequency and bandwidth into codes"
+    target_version = 1
+
+    def transform(self, doc: dict) -> Optional[dict]:
+        fields = normalise_subscription_fields(doc)
+        # The new end_date can move a subscription back from expiring/expired
+        fields["status"] = derive_subscription_status(fields["end_date"])
+        changed = {key: value for key, value in fields.items() if doc.get(key) != value}
+        return changed or None
+
+MIGRATIONS = {migration.id: migration for migration in [CalendarMonthsAndCodesMigration()]}
+migration_tasks: Dict[str, asyncio.Task] = {}
+
+def migration_progress_id(migration: Migration, collection_name: str, dry_run: bool) -> str:
+    return f"{migration.id}:{collection_name}" + (":dry-run" if dry_run else "")
+
+async def claim_migration(progress_id: str, migration: Migration, collection_name: str, dry_run: bool) -> Optional[dict]:
+    """Take the lease on a migration's progress record so only one worker runs it."""
+    now = datetime.utcnow()
+    try:
+        return await db.migrations.find_one_and_update(
+            {
+                "id": progress_id,
+                "status": {"$ne": "completed"},
+                "$or": [{"status": {"$ne": "running"}}, {"locked_until": {"$lt": now}}],
+            },
+            {
+                "$set": {"status": "running", "locked_until": now + timedelta(seconds=MIGRATION_LEASE_SECONDS), "updated_at": now},
+                "$setOnInsert": {
+                    "migration_id": migration.id,
+                    "collection": collection_name,
+                    "dry_run": dry_run,
+                    "last_id": None,
+                    "scanned": 0,
+                    "modified": 0,
+                    "samples": [],
+                    "started_at": now,
+                },
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The record exists but is completed or leased, so the upsert collided
+        return None
+
+async def apply_migration_side_effects(migration: Migration, collection_name: str, docs: List[dict], batch_changes: Dict[Any, dict]):
+    """Audit the rewritten documents and drop alerts that no longer apply."""
+    stale_alert_subscriptions = []
+    for doc in docs:
+        changes = batch_changes[doc["_id"]]
+        record_change(
+            doc["tenant_id"], doc["id"], "migrate", "system", f"migration:{migration.id}",
+            {key: doc.get(key) for key in changes}, changes
+        )
+        if collection_name == "subscriptions" and changes.get("status") == "active" and doc.get("status") != "active":
+            stale_alert_subscriptions.append(doc)
+    
+    # New expiring alerts are raised by the next update_subscription_statuses sweep
+    for doc in stale_alert_subscriptions:
+        alerts = await db.alerts.find(
+            {"tenant_id": doc["tenant_id"], "subscription_id": doc["id"]}, {"id": 1}
+        ).to_list(None)
+        if not alerts:
+            continue
+        await db.alerts.delete_many({"tenant_id": doc["tenant_id"], "subscription_id": doc["id"]})
+        await db.tombstones.insert_many([
+            Tombstone(id=alert["id"], tenant_id=doc["tenant_id"], collection="alerts").dict() for alert in alerts
+        ])
+        tenant_stats_cache.invalidate(doc["tenant_id"])
+
+async def run_migration_on_collection(migration: Migration, collection_name: str, dry_run: bool):
+    progress_id = migration_progress_id(migration, collection_name, dry_run)
+    progress = await claim_migration(progress_id, migration, collection_name, dry_run)
+    if progress is None:
+        logger.info(f"Migration {progress_id} is completed or running elsewhere")
+        return
+    
+    collection = db[collection_name]
+    pending = {"schema_version": {"$not": {"$gte": migration.target_version}}}
+    last_id = progress["last_id"]
+    skipped = 0
+    passes = 1
+    try:
+        while True:
+            # Walk the collection in _id order so an interrupted run resumes where it stopped
+            query = {**pending, "_id": {"$gt": last_id}} if last_id is not None else pending
+            batch = await collection.find(query).sort("_id", 1).to_list(MIGRATION_BATCH_SIZE)
+            if not batch:
+                if skipped and passes < 5:
+                    # Documents written concurrently were skipped; sweep once more for them
+                    last_id, skipped = None, 0
+                    passes += 1
+                    continue
+                break
+            
+            now = datetime.utcnow()
+            operations = []
+            samples = []
+            batch_changes = {}
+            for doc in batch:
+                changes = migration.transform(doc) or {}
+                changes["schema_version"] = migration.target_version
+                batch_changes[doc["_id"]] = changes
+                if len(samples) < 5 and len(changes) > 1:
+                    samples.append({"id": doc.get("id"), "changes": diff_documents(
+                        {key: doc.get(key) for key in changes}, changes
+                    )})
+                # Match on updated_at so a document edited through the API meanwhile is not overwritten
+                operations.append(UpdateOne(
+                    {"_id": doc["_id"], "updated_at": doc.get("updated_at")},
+                    {"$set": {**changes, "updated_at": now}}
+                ))
+            
+            if not dry_run:
+                result = await collection.bulk_write(operations, ordered=False)
+                modified = result.modified_count
+                skipped += len(operations) - result.matched_count
+                applied = batch
+                if result.matched_count < len(operations):
+                    written = await collection.find(
+                        {"_id": {"$in": [doc["_id"] for doc in batch]}, "updated_at": now}, {"_id": 1}
+                    ).to_list(None)
+                    written_ids = {doc["_id"] for doc in written}
+                    applied = [doc for doc in batch if doc["_id"] in written_ids]
+                await apply_migration_side_effects(migration, collection_name, applied, batch_changes)
+            else:
+                modified = len(operations)
+            
+            last_id = batch[-1]["_id"]
+            update = {
+                "$set": {"last_id": last_id, "updated_at": now, "locked_until": now + timedelta(seconds=MIGRATION_LEASE_SECONDS)},
+                "$inc": {"scanned": len(batch), "modified": modified},
+            }
+            if samples:
+                update["$push"] = {"samples": {"$each": samples, "$slice": 20}}
+            await db.migrations.update_one({"id": progress_id}, update)
+            
+            # Throttle so the API keeps most of the database's capacity
+            await asyncio.sleep(MIGRATION_BATCH_DELAY_SECONDS)
+        
+        await db.migrations.update_one(
+            {"id": progress_id},
+            {"$set": {"status": "completed", "finished_at": datetime.utcnow(), "locked_until": None}}
+        )
+    except asyncio.CancelledError:
+        await db.migrations.update_one({"id": progress_id}, {"$set": {"status": "paused", "locked_until": None}})
+        raise
+    except Exception as e:
+        logger.error(f"Migration {progress_id} failed: {e}")
+        await db.migrations.update_one(
+            {"id": progress_id},
+            {"$set": {"status": "failed", "error": str(e), "locked_until": None}}
+        )
+
+async def run_migration(migration: Migration, dry_run: bool):
+    for collection_name in migration.collections:
+        await run_migration_on_collection(migration, collection_name, dry_run)
+
+@api_router.get("/admin/migrations")
+async def list_migrations(current_admin: User = Depends(get_current_superadmin)):
+    progress = await db.migrations.find({}, {"_id": 0, "samples": 0}).to_list(None)
+    return [
+        {
+            "id": migration.id,
+            "description": migration.description,
+            "target_version": migration.target_version,
+            "progress": [record for record in progress if record["migration_id"] == migration.id],
+        }
+        for migration in MIGRATIONS.values()
+    ]
+
+@api_router.post("/admin/migrations/{migration_id}/run", status_code=status.HTTP_202_ACCEPTED)
+async def start_migration(
+    migration_id: str,
+    dry_run: bool = True,
+    current_admin: User = Depends(get_current_superadmin)
+):
+    """Start or resume a migration in the background. Dry runs are the default."""
+    migration = MIGRATIONS.get(migration_id)
+    if migration is None:
+        raise HTTPException(status_code=404, detail="Migration not found")
+    
+    task_key = f"{migration_id}:{dry_run}"
+    if task_key in migration_tasks and not migration_tasks[task_key].done():
+        raise HTTPException(status_code=409, detail="Migration is already running on this worker")
+    if dry_run:
+        # A dry run always rescans from the beginning
+        await db.migrations.delete_many({"migration_id": migration_id, "dry_run": True})
+    migration_tasks[task_key] = asyncio.create_task(run_migration(migration, dry_run))
+    return {"message": "Migration started", "migration_id": migration_id, "dry_run": dry_run}
+
+@api_router.get("/admin/migrations/{migration_id}")
+async def get_migration_progress(migration_id: str, current_admin: User = Depends(get_current_superadmin)):
+    if migration_id not in MIGRATIONS:
+        raise HTTPException(status_code=404, detail="Migration not found")
+    return await db.migrations.find({"migration_id": migration_id}, {"_id": 0}).to_list(None)
+
 # Run status update on startup
 @app.on_event("startup")
 async def startup_event():
+    # Documents written before multi-tenancy belong to the default tenant
+    for collection in (db.users, db.subscriptions, db.alerts, db.subscription_history):
+        await collection.update_many(
+            {"tenant_id": {"$exists": False}},
+            {"$set": {"tenant_id": DEFAULT_TENANT_ID}}
+        )
+    await db.users.update_one(
+        {"username": "admin", "tenant_id": DEFAULT_TENANT_ID, "role": {"$exists": False}},
+        {"$set": {"role": "superadmin"}}
+    )
+    
+    # Backfill updated_at for documents created before delta sync existed
+    for collection in (db.subscriptions, db.alerts):
+        await collection.update_many(
+            {"updated_at": {"$exists": False}},
+            [{"$set": {"updated_at": "$created_at"}}]
+        )
+    
+    # Every tenant-scoped index is prefixed with tenant_id
+    await db.users.create_index("username", unique=True)
+    await db.subscriptions.create_index([("tenant_id", 1), ("id", 1)], unique=True)
+    await db.subscriptions.create_index([("tenant_id", 1), ("status", 1), ("end_date", 1)])
+    await db.subscriptions.create_index([("tenant_id", 1), ("technology", 1)])
+    await db.alerts.create_index([("tenant_id", 1), ("created_at", -1)])
+    await db.alerts.create_index([("tenant_id", 1), ("subscription_id", 1), ("alert_type", 1)])
+    await db.subscription_history.create_index([("tenant_id", 1), ("subscription_id", 1), ("created_at", -1)])
+    await db.subscriptions.create_index([("tenant_id", 1), ("updated_at", 1), ("id", 1)])
+    await db.alerts.create_index([("tenant_id", 1), ("updated_at", 1), ("id", 1)])
+    await db.tombstones.create_index([("tenant_id", 1), ("updated_at", 1), ("id", 1)])
+    await db.tombstones.create_index(
+        "updated_at", expireAfterSeconds=SYNC_TOMBSTONE_RETENTION_DAYS * 24 * 3600
+    )
+    await db.archive_runs.create_index("id", unique=True)
+    await db.subscriptions_archive.create_index([("tenant_id", 1), ("id", 1)], unique=True)
+    await db.alerts_archive.create_index([("tenant_id", 1), ("id", 1)], unique=True)
+    await db.alerts_archive.create_index([("tenant_id", 1), ("subscription_id", 1)])
+    await db.migrations.create_index("id", unique=True)
+    await db.report_jobs.create_index([("tenant_id", 1), ("id", 1)], unique=True)
+    await db.report_jobs.create_index([("tenant_id", 1), ("params_hash", 1), ("created_at", -1)])
+    # Jobs whose worker stopped renewing the lease will never finish; live workers keep theirs fresh
+    await db.report_jobs.update_many(
+        {"status": {"$in": ["queued", "running"]}, "locked_until": {"$not": {"$gte": datetime.utcnow()}}},
+        {"$set": {"status": "failed", "error": "Interrupted: the worker running it stopped", "finished_at": datetime.utcnow()}}
+    )
+    
+    global report_pool
+    # Forking this multi-threaded process (motor, sampler) could copy held locks into the children
+    report_pool = ProcessPoolExecutor(
+        max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+    )
+    if SLOW_REQUEST_THRESHOLD_MS > 0:
+        loop_sampler.start(threading.get_ident())
+    audit_log.start()
     await update_subscription_statuses()
     
+    global archive_task
+    archive_task = asyncio.create_task(run_archive_loop())
+    
     # Create default admin user if no users exist
     user_count = await db.users.count_documents({})
     if user_count == 0:
@@ -330,6 +1691,7 @@ async def startup_event():
             email="admin@afrikanet.com",
             full_name="Administrateur",
             hashed_password=get_password_hash("admin123"),
+            role="superadmin",
             is_active=True
         )
         await db.users.insert_one(default_admin.dict())
@@ -338,6 +1700,28 @@ async def startup_event():
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def capture_slow_requests(request: Request, call_next):
+    if SLOW_REQUEST_THRESHOLD_MS <= 0:
+        return await call_next(request)
+    started = time.monotonic()
+    response = await call_next(request)
+    finished = time.monotonic()
+    duration_ms = (finished - started) * 1000
+    if duration_ms >= SLOW_REQUEST_THRESHOLD_MS:
+        slow_requests.append({
+            "id": str(uuid.uuid4()),
+            "method": request.method,
+            "path": request.url.path,
+            "status_code": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            "captured_at": datetime.utcnow(),
+            "stacks": format_collapsed(loop_sampler.collect(started, finished)),
+            "mongo_commands": mongo_command_trace.collect(started, finished),
+        })
+        logger.warning(f"Slow request {request.method} {request.url.path} took {duration_ms:.0f}ms")
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -355,4 +1739,12 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    loop_sampler.stop()
+    for task in migration_tasks.values():
+        task.cancel()
+    if archive_task is not None:
+        archive_task.cancel()
+    if report_pool is not None:
+        report_pool.shutdown(wait=False, cancel_futures=True)
+    await audit_log.stop()
     client.close()
\ No newline at end of file
@@ -5,6 +5,51 @@ import axios from "axios";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Local data cache kept up to date with /api/sync deltas
+const SYNC_CACHE_KEY = 'syncCache';
+
+const loadSyncCache = () => {
+  try {
+    const cached = JSON.parse(localStorage.getItem(SYNC_CACHE_KEY));
+    if (cached && cached.token) {
+      return cached;
+    }
+  } catch (error) {
+    console.error('Error reading sync cache:', error);
+  }
+  return { token: null, subscriptions: {}, alerts: {} };
+};
+
+const applyDelta = (records, delta) => {
+  const next = { ...records };
+  delta.upserted.forEach((record) => { next[record.id] = record; });
+  delta.deleted.forEach((id) => { delete next[id]; });
+  return next;
+};
+
+const syncData = async () => {
+  let cache = loadSyncCache();
+  let hasMore = true;
+  while (hasMore) {
+    const response = await axios.get(`${API}/sync`, { params: cache.token ? { token: cache.token } : {} });
+    const { reset, subscriptions, alerts, sync_token, has_more } = response.data;
+    const base = reset ? { subscriptions: {}, alerts: {} } : cache;
+    cache = {
+      token: sync_token,
+      subscriptions: applyDelta(base.subscriptions, subscriptions),
+      alerts: applyDelta(base.alerts, alerts)
+    };
+    hasMore = has_more;
+  }
+  localStorage.setItem(SYNC_CACHE_KEY, JSON.stringify(cache));
+  return {
+    subscriptions: Object.values(cache.subscriptions)
+      .sort((a, b) => new Date(a.created_at) - new Date(b.created_at)),
+    alerts: Object.values(cache.alerts)
+      .sort((a, b) => new Date(b.created_at) - new Date(a.created_at))
+  };
+};
+
 // Auth Context
 const AuthContext = createContext();
 
@@ -44,6 +89,7 @@ const AuthProvider = ({ children }) => {
       setToken(access_token);
       setUser(user);
       localStorage.setItem('token', access_token);
+      localStorage.removeItem(SYNC_CACHE_KEY);
       axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
       return { success: true };
     } catch (error) {
@@ -55,6 +101,7 @@ const AuthProvider = ({ children }) => {
     setToken(null);
     setUser(null);
     localStorage.removeItem('token');
+    localStorage.removeItem(SYNC_CACHE_KEY);
     delete axios.defaults.headers.common['Authorization'];
   };
 
@@ -233,12 +280,11 @@ const Dashboard = () => {
 
   const fetchDashboardData = async () => {
     try {
-      const [statsRes, alertsRes] = await Promise.all([
-        axios.get(`${API}/dashboard/stats`),
-        axios.get(`${API}/alerts`)
-      ]);
-      setStats(statsRes.data);
-      setAlerts(alertsRes.data.slice(0, 3)); // Show only first 3 alerts
+      const response = await axios.get(`${API}/dashboard`, {
+        params: { fields: 'stats,alerts', alerts_limit: 3 } // Show only first 3 alerts
+      });
+      setStats(response.data.stats);
+      setAlerts(response.data.alerts || []);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     } finally {
@@ -376,8 +422,8 @@ const Subscriptions = () => {
 
   const fetchSubscriptions = async () => {
     try {
-      const response = await axios.get(`${API}/subscriptions`);
-      setSubscriptions(response.data);
+      const data = await syncData();
+      setSubscriptions(data.subscriptions);
     } catch (error) {
       console.error('Error fetching subscriptions:', error);
     } finally {
@@ -748,8 +794,8 @@ const Alerts = () => {
 
   const fetchAlerts = async () => {
     try {
-      const response = await axios.get(`${API}/alerts`);
-      setAlerts(response.data);
+      const data = await syncData();
+      setAlerts(data.alerts);
     } catch (error) {
       console.error('Error fetching alerts:', error);
     } finally {
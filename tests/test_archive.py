@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from pymongo import DeleteOne, ReplaceOne
+
+import server
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if isinstance(condition, dict) and "$in" in condition:
+            if doc.get(key) not in condition["$in"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class FakeCollection:
+    """In-memory stand-in for the few collection operations move_documents uses."""
+
+    def __init__(self, docs=None):
+        self.docs = [dict(doc) for doc in docs or []]
+        self.next_id = 1000
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs if matches(doc, query)])
+
+    async def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            if isinstance(op, ReplaceOne):
+                existing = [doc for doc in self.docs if matches(doc, op._filter)]
+                if existing:
+                    existing[0].clear()
+                    existing[0].update(op._doc, _id=existing[0].get("_id"))
+                elif op._upsert:
+                    self.next_id += 1
+                    self.docs.append({**op._doc, "_id": self.next_id})
+            elif isinstance(op, DeleteOne):
+                for doc in self.docs:
+                    if matches(doc, op._filter):
+                        self.docs.remove(doc)
+                        break
+            else:
+                raise NotImplementedError(type(op))
+
+    def ids(self):
+        return sorted(doc["id"] for doc in self.docs)
+
+
+def subscription(object_id, subscription_id, updated_at):
+    return {"_id": object_id, "id": subscription_id, "tenant_id": "afrikanet", "amount": 100, "updated_at": updated_at}
+
+
+def test_move_documents_moves_unchanged_documents():
+    read_at = datetime(2026, 1, 1)
+    docs = [subscription(1, "a", read_at), subscription(2, "b", read_at)]
+    source, target = FakeCollection(docs), FakeCollection()
+    archived_at = datetime(2026, 10, 19)
+
+    moved = asyncio.run(server.move_documents(source, target, docs, archived_at))
+
+    assert [doc["id"] for doc in moved] == ["a", "b"]
+    assert source.ids() == []
+    assert target.ids() == ["a", "b"]
+    assert all(doc["archived_at"] == archived_at for doc in target.docs)
+
+
+def test_move_documents_keeps_documents_edited_mid_move():
+    read_at = datetime(2026, 1, 1)
+    docs = [subscription(1, "a", read_at), subscription(2, "b", read_at)]
+    source, target = FakeCollection(docs), FakeCollection()
+    # "b" is renewed through the API after the archiver read it
+    source.docs[1].update(amount=250, updated_at=read_at + timedelta(minutes=5))
+
+    moved = asyncio.run(server.move_documents(source, target, docs, datetime(2026, 10, 19)))
+
+    assert [doc["id"] for doc in moved] == ["a"]
+    assert source.ids() == ["b"]
+    assert source.docs[0]["amount"] == 250
+    # The stale copy of "b" is withdrawn from the archive
+    assert target.ids() == ["a"]
+
+
+def test_move_documents_restore_refreshes_timestamps():
+    docs = [subscription(1, "a", datetime(2026, 1, 1))]
+    source, target = FakeCollection(docs), FakeCollection()
+
+    moved = asyncio.run(server.move_documents(source, target, docs, None))
+
+    assert len(moved) == 1
+    restored = target.docs[0]
+    assert restored["archived_at"] is None
+    assert restored["restored_at"] == restored["updated_at"] > datetime(2026, 1, 1)
+
+
+def test_move_documents_with_nothing_to_move():
+    assert asyncio.run(server.move_documents(FakeCollection(), FakeCollection(), [], None)) == []
@@ -0,0 +1,77 @@
+import asyncio
+
+import server
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.batches = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.batches.append(list(documents))
+
+
+def entry(subscription_id):
+    return server.SubscriptionHistory(
+        subscription_id=subscription_id,
+        action="update",
+        user_id="user-1",
+        username="agent",
+        changes={"amount": {"old": 1, "new": 2}},
+    )
+
+
+def test_record_does_not_write_synchronously():
+    collection = RecordingCollection()
+    writer = server.AuditLogWriter(collection, maxsize=10, batch_size=5, flush_interval=0)
+
+    writer.record(entry("sub-1"))
+
+    assert collection.batches == []
+    assert writer.queue.qsize() == 1
+
+
+def test_overflow_drops_oldest_entry():
+    collection = RecordingCollection()
+    writer = server.AuditLogWriter(collection, maxsize=2, batch_size=10, flush_interval=0)
+
+    for subscription_id in ("sub-1", "sub-2", "sub-3"):
+        writer.record(entry(subscription_id))
+
+    assert writer.dropped == 1
+    asyncio.run(writer.stop())
+    assert [[doc["subscription_id"] for doc in batch] for batch in collection.batches] == [["sub-2", "sub-3"]]
+
+
+def test_stop_flushes_in_batches():
+    collection = RecordingCollection()
+    writer = server.AuditLogWriter(collection, maxsize=10, batch_size=2, flush_interval=0)
+
+    for i in range(5):
+        writer.record(entry(f"sub-{i}"))
+    asyncio.run(writer.stop())
+
+    assert [len(batch) for batch in collection.batches] == [2, 2, 1]
+
+
+def test_background_task_flushes_entries():
+    collection = RecordingCollection()
+
+    async def scenario():
+        writer = server.AuditLogWriter(collection, maxsize=10, batch_size=3, flush_interval=0.01)
+        writer.start()
+        for i in range(3):
+            writer.record(entry(f"sub-{i}"))
+        await asyncio.sleep(0.05)
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+    assert sum(len(batch) for batch in collection.batches) == 3
+
+
+def test_diff_ignores_bookkeeping_fields():
+    old = {"_id": 1, "amount": 100, "updated_at": 1, "schema_version": 0}
+    new = {"_id": 2, "amount": 100, "updated_at": 2, "schema_version": 1}
+
+    assert server.diff_documents(old, new) == {}
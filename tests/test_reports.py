@@ -0,0 +1,130 @@
+import csv
+from datetime import datetime
+
+import pytest
+
+import server
+
+pd = pytest.importorskip("pandas")
+
+
+def record(client_name, technology="VSAT", end_date=datetime(2026, 11, 15), **overrides):
+    doc = {
+        "client_name": client_name,
+        "phone": "+243000000000",
+        "technology": technology,
+        "plan": "VSAT Standard",
+        "bandwidth": "10Mbps",
+        "frequency": "Ku-band",
+        "amount": 100000,
+        "status": "active",
+        "start_date": datetime(2026, 1, 1),
+        "end_date": end_date,
+    }
+    doc.update(overrides)
+    return doc
+
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_excel_sheet_name_replaces_invalid_characters():
+    assert server.excel_sheet_name("VSAT/Pro [C]:*?\\", set()) == "VSAT_Pro _C_____"
+
+
+def test_excel_sheet_name_truncates_to_31_characters():
+    name = server.excel_sheet_name("x" * 40, set())
+    assert name == "x" * 31
+
+
+def test_excel_sheet_name_deduplicates_case_insensitively():
+    taken = {"tous"}
+    assert server.excel_sheet_name("Tous", taken) == "Tous (2)"
+    assert server.excel_sheet_name("TOUS", taken) == "TOUS (3)"
+    assert server.excel_sheet_name("VSAT/Pro", taken) == "VSAT_Pro"
+    assert server.excel_sheet_name("VSAT:Pro", taken) == "VSAT_Pro (2)"
+
+
+def test_excel_sheet_name_suffix_stays_within_31_characters():
+    taken = set()
+    first = server.excel_sheet_name("y" * 40, taken)
+    second = server.excel_sheet_name("y" * 40, taken)
+    assert first != second
+    assert len(second) == 31
+    assert second.endswith(" (2)")
+
+
+def test_excel_sheet_name_falls_back_when_empty():
+    assert server.excel_sheet_name("''", set()) == "Feuille"
+
+
+def test_technology_export_xlsx_with_colliding_names(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    output = tmp_path / "report.xlsx"
+    records = [record("a", "VSAT/Pro"), record("b", "VSAT:Pro"), record("c", "Tous"), record("d", "Starlink")]
+
+    server.build_report("technology_export", "xlsx", {}, records, str(output))
+
+    sheets = openpyxl.load_workbook(output).sheetnames
+    assert sheets[0] == "Tous"
+    assert sorted(sheets[1:]) == sorted(["Starlink", "Tous (2)", "VSAT_Pro", "VSAT_Pro (2)"])
+    assert list(tmp_path.iterdir()) == [output]
+
+
+@pytest.mark.parametrize("report_type, header", [
+    ("technology_export", server.REPORT_COLUMNS),
+    ("revenue_by_frequency", ["frequency", "subscribers", "total_amount", "average_amount"]),
+    ("expiry_forecast", ["month", "technology", "subscriptions", "amount_at_risk"]),
+])
+def test_empty_dataset_writes_header_only(tmp_path, report_type, header):
+    output = tmp_path / "report.csv"
+    params = {"as_of": "2026-10-19T00:00:00", "forecast_months": 3}
+
+    server.build_report(report_type, "csv", params, [], str(output))
+
+    with open(output, newline="") as f:
+        assert list(csv.reader(f)) == [header]
+
+
+def test_expiry_forecast_horizon_is_start_inclusive_end_exclusive(tmp_path):
+    output = tmp_path / "forecast.csv"
+    records = [
+        record("before", end_date=datetime(2026, 10, 18, 23, 59)),
+        record("on_as_of", end_date=datetime(2026, 10, 19)),
+        record("inside", end_date=datetime(2027, 1, 18, 23, 59)),
+        record("on_horizon", end_date=datetime(2027, 1, 19)),
+    ]
+
+    server.build_report(
+        "expiry_forecast", "csv", {"as_of": "2026-10-19T00:00:00", "forecast_months": 3}, records, str(output)
+    )
+
+    rows = read_csv(output)
+    assert [(row["month"], row["subscriptions"]) for row in rows] == [("2026-10", "1"), ("2027-01", "1")]
+
+
+def test_revenue_by_frequency_counts_only_billed_subscriptions(tmp_path):
+    output = tmp_path / "revenue.csv"
+    records = [
+        record("a", amount=100, status="active"),
+        record("b", amount=300, status="expiring"),
+        record("c", amount=1000, status="expired"),
+        record("d", amount=50, status="active", frequency="C-band"),
+    ]
+
+    server.build_report("revenue_by_frequency", "csv", {}, records, str(output))
+
+    rows = {row["frequency"]: row for row in read_csv(output)}
+    assert rows["Ku-band"]["subscribers"] == "2"
+    assert rows["Ku-band"]["total_amount"] == "400"
+    assert rows["C-band"]["total_amount"] == "50"
+
+
+def test_unknown_report_type_leaves_no_file(tmp_path):
+    output = tmp_path / "report.csv"
+
+    with pytest.raises(ValueError):
+        server.build_report("nope", "csv", {}, [], str(output))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("start, months, expected", [
+    (datetime(2026, 1, 15), 1, datetime(2026, 2, 15)),
+    (datetime(2026, 1, 31), 1, datetime(2026, 2, 28)),
+    (datetime(2028, 1, 31), 1, datetime(2028, 2, 29)),
+    (datetime(2026, 11, 30), 3, datetime(2027, 2, 28)),
+    (datetime(2026, 3, 10, 8, 30), 12, datetime(2027, 3, 10, 8, 30)),
+    (datetime(2026, 5, 1), 0, datetime(2026, 5, 1)),
+])
+def test_add_months(start, months, expected):
+    assert server.add_months(start, months) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Starlink", ("Starlink", "SL")),
+    ("starlink ", ("Starlink", "SL")),
+    ("vsat", ("VSAT", "VS")),
+    ("Unknown", ("Unknown", None)),
+])
+def test_normalise_technology(value, expected):
+    assert server.normalise_choice(value, server.TECHNOLOGY_CODES) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Ku-band", ("Ku-band", "KU")),
+    ("ka band", ("Ka-band", "KA")),
+    ("C_BAND", ("C-band", "C")),
+    ("L-band", ("L-band", None)),
+])
+def test_normalise_frequency(value, expected):
+    assert server.normalise_choice(value, server.FREQUENCY_CODES) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("100Mbps", 100.0),
+    ("10.5 Mbps", 10.5),
+    ("0.5 Mbps", 0.5),
+    ("2,5 Gbps", 2500.0),
+    ("20 Mb/s", 20.0),
+    ("10 Mbits/s", 10.0),
+    ("512kbps", 0.512),
+    ("100 MBps", None),
+    ("100", None),
+    ("fibre", None),
+    ("", None),
+])
+def test_parse_bandwidth_mbps(value, expected):
+    result = server.parse_bandwidth_mbps(value)
+    if expected is None:
+        assert result is None
+    else:
+        assert result == pytest.approx(expected)
+
+
+def make_subscription(**overrides):
+    doc = {
+        "id": "sub-1",
+        "tenant_id": "afrikanet",
+        "technology": "VSAT",
+        "frequency": "Ku-band",
+        "bandwidth": "10.5 Mbps",
+        "start_date": datetime(2026, 1, 31),
+        "duration_months": 1,
+        "end_date": datetime(2026, 1, 31) + timedelta(days=30),
+        "status": "active",
+    }
+    doc.update(overrides)
+    return doc
+
+
+def test_migration_computes_calendar_end_date_and_codes():
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=90)
+    doc = make_subscription(start_date=start, duration_months=12, end_date=start + timedelta(days=360))
+
+    changes = server.CalendarMonthsAndCodesMigration().transform(doc)
+
+    assert changes["end_date"] == server.add_months(start, 12)
+    assert changes["technology_code"] == "VS"
+    assert changes["frequency_code"] == "KU"
+    assert changes["bandwidth_mbps"] == 10.5
+    assert changes["schema_version"] == 1
+    # The free-text bandwidth is kept as entered
+    assert "bandwidth" not in changes
+    assert "status" not in changes
+
+
+def test_migration_revives_subscription_expired_under_30_day_rule():
+    start = datetime.utcnow() - timedelta(days=360)
+    # 12 x 30 days ended today, 12 calendar months end a few days later
+    doc = make_subscription(start_date=start, duration_months=12, end_date=start + timedelta(days=360), status="expired")
+
+    changes = server.CalendarMonthsAndCodesMigration().transform(doc)
+
+    assert changes["end_date"] > datetime.utcnow()
+    assert changes["status"] == "expiring"
+
+
+def test_migration_is_a_no_op_on_migrated_documents():
+    migration = server.CalendarMonthsAndCodesMigration()
+    start = datetime.utcnow() + timedelta(days=90)
+    doc = make_subscription(start_date=start, duration_months=6)
+    doc.update(migration.transform(doc))
+
+    assert migration.transform(doc) is None
+
+
+@pytest.mark.parametrize("offset, expected", [
+    (timedelta(days=-1), "expired"),
+    (timedelta(days=10), "expiring"),
+    (timedelta(days=45), "active"),
+])
+def test_derive_subscription_status(offset, expected):
+    now = datetime(2026, 10, 19)
+    assert server.derive_subscription_status(now + offset, now) == expected
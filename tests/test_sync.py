@@ -0,0 +1,120 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeCollection:
+    """Returns the given documents, already in (updated_at, id) order, for any query."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor(self.docs)
+
+
+def tenant():
+    user = server.User(username="agent", email="a@example.com", full_name="Agent", hashed_password="x")
+    return server.TenantScope(tenant_id="afrikanet", user=user)
+
+
+def test_sync_token_round_trip():
+    cursors = {
+        "s": (datetime(2026, 10, 19, 8, 30, 0, 123000), "sub-9"),
+        "a": (server.SYNC_EPOCH, ""),
+        "t": (datetime(2026, 10, 18), "tomb-1"),
+    }
+    assert server.decode_sync_token(server.encode_sync_token(cursors)) == cursors
+
+
+def test_missing_sync_token_starts_from_epoch():
+    assert server.decode_sync_token(None) == {key: (server.SYNC_EPOCH, "") for key in server.SYNC_SOURCES}
+
+
+@pytest.mark.parametrize("token", ["not-base64!", "e30=", "eyJzIjpbXX0="])
+def test_invalid_sync_token_is_rejected(token):
+    with pytest.raises(HTTPException) as excinfo:
+        server.decode_sync_token(token)
+    assert excinfo.value.status_code == 400
+
+
+def test_sync_token_with_utc_offset_is_rejected():
+    payload = {key: ["2026-10-19T08:00:00+00:00", ""] for key in server.SYNC_SOURCES}
+    token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    with pytest.raises(HTTPException) as excinfo:
+        server.decode_sync_token(token)
+    assert excinfo.value.status_code == 400
+
+
+def test_fetch_changes_scopes_query_to_tenant():
+    collection = FakeCollection([])
+    asyncio.run(server.fetch_changes(collection, tenant(), (server.SYNC_EPOCH, ""), 10))
+    assert collection.queries[0]["tenant_id"] == "afrikanet"
+
+
+def test_fetch_changes_keeps_cursor_on_old_records():
+    old = datetime.utcnow() - timedelta(hours=1)
+    docs = [{"id": "a", "updated_at": old}, {"id": "b", "updated_at": old}]
+
+    result, cursor, has_more = asyncio.run(
+        server.fetch_changes(FakeCollection(docs), tenant(), (server.SYNC_EPOCH, ""), 10)
+    )
+
+    assert result == docs
+    assert cursor == (old, "b")
+    assert has_more is False
+
+
+def test_fetch_changes_rewinds_cursor_over_recent_records():
+    before = datetime.utcnow()
+    docs = [{"id": "a", "updated_at": datetime.utcnow()}]
+
+    _, cursor, has_more = asyncio.run(
+        server.fetch_changes(FakeCollection(docs), tenant(), (server.SYNC_EPOCH, ""), 10)
+    )
+
+    overlap = timedelta(seconds=server.SYNC_OVERLAP_SECONDS)
+    assert has_more is False
+    assert cursor[1] == ""
+    assert before - overlap - timedelta(seconds=1) <= cursor[0] <= datetime.utcnow() - overlap
+
+
+def test_fetch_changes_does_not_rewind_before_the_previous_cursor():
+    since = datetime.utcnow() - timedelta(seconds=1)
+
+    _, cursor, _ = asyncio.run(server.fetch_changes(FakeCollection([]), tenant(), (since, "x"), 10))
+
+    assert cursor == (since, "")
+
+
+def test_fetch_changes_pages_without_rewinding():
+    now = datetime.utcnow()
+    docs = [{"id": str(i), "updated_at": now} for i in range(3)]
+
+    result, cursor, has_more = asyncio.run(
+        server.fetch_changes(FakeCollection(docs), tenant(), (server.SYNC_EPOCH, ""), 2)
+    )
+
+    assert [doc["id"] for doc in result] == ["0", "1"]
+    assert cursor == (now, "1")
+    assert has_more is True
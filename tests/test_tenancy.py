@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+import server
+
+
+def make_user(role="agent", tenant_id="kinshasa"):
+    return server.User(
+        username=f"{role}-{tenant_id}",
+        email=f"{role}@{tenant_id}.example.com",
+        full_name="Test",
+        hashed_password="x",
+        role=role,
+        tenant_id=tenant_id,
+    )
+
+
+def new_user(**overrides):
+    data = {
+        "username": "new-agent",
+        "email": "new@example.com",
+        "full_name": "New Agent",
+        "password": "secret",
+        "tenant_id": "kinshasa",
+    }
+    data.update(overrides)
+    return data
+
+
+class FakeUsers:
+    def __init__(self):
+        self.inserted = []
+
+    async def find_one(self, query):
+        return None
+
+    async def insert_one(self, document):
+        self.inserted.append(document)
+
+
+class FakeDb:
+    def __init__(self):
+        self.users = FakeUsers()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDb()
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+
+def test_tenant_scope_filter_adds_tenant():
+    scope = server.TenantScope(tenant_id="kinshasa", user=make_user())
+
+    assert scope.filter() == {"tenant_id": "kinshasa"}
+    assert scope.filter({"status": "active"}) == {"status": "active", "tenant_id": "kinshasa"}
+
+
+def test_tenant_scope_filter_overrides_caller_tenant():
+    scope = server.TenantScope(tenant_id="kinshasa", user=make_user())
+
+    assert scope.filter({"tenant_id": "lubumbashi"})["tenant_id"] == "kinshasa"
+
+
+def test_rate_limiter_allows_burst_then_refills(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+    limiter = server.TenantRateLimiter(rate_per_minute=60, burst=2)
+
+    assert limiter.allow("kinshasa")
+    assert limiter.allow("kinshasa")
+    assert not limiter.allow("kinshasa")
+
+    clock[0] += 1  # one token per second
+    assert limiter.allow("kinshasa")
+    assert not limiter.allow("kinshasa")
+
+
+def test_rate_limiter_buckets_are_per_tenant(monkeypatch):
+    monkeypatch.setattr(server.time, "monotonic", lambda: 1000.0)
+    limiter = server.TenantRateLimiter(rate_per_minute=60, burst=1)
+
+    assert limiter.allow("kinshasa")
+    assert not limiter.allow("kinshasa")
+    assert limiter.allow("lubumbashi")
+
+
+@pytest.mark.parametrize("tenant_id", ["../..", "Kinshasa", "a/b", "", "x" * 65])
+def test_tenant_user_rejects_invalid_tenant_id(tenant_id):
+    with pytest.raises(ValidationError):
+        server.TenantUserCreate(**new_user(tenant_id=tenant_id))
+
+
+def test_tenant_admin_cannot_create_users_in_another_tenant(fake_db):
+    request = server.TenantUserCreate(**new_user(tenant_id="lubumbashi"))
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.create_tenant_user(request, make_user(role="admin")))
+    assert excinfo.value.status_code == 403
+    assert fake_db.users.inserted == []
+
+
+def test_tenant_admin_cannot_create_superadmins(fake_db):
+    request = server.TenantUserCreate(**new_user(role="superadmin"))
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.create_tenant_user(request, make_user(role="admin")))
+    assert excinfo.value.status_code == 403
+    assert fake_db.users.inserted == []
+
+
+def test_tenant_admin_creates_users_in_own_tenant(fake_db):
+    request = server.TenantUserCreate(**new_user(role="admin"))
+
+    asyncio.run(server.create_tenant_user(request, make_user(role="admin")))
+
+    assert fake_db.users.inserted[0]["tenant_id"] == "kinshasa"
+    assert fake_db.users.inserted[0]["role"] == "admin"
+
+
+def test_superadmin_creates_users_in_any_tenant(fake_db):
+    request = server.TenantUserCreate(**new_user(tenant_id="lubumbashi"))
+
+    asyncio.run(server.create_tenant_user(request, make_user(role="superadmin", tenant_id="afrikanet")))
+
+    assert fake_db.users.inserted[0]["tenant_id"] == "lubumbashi"
+
+
+def test_register_creates_agent_in_admin_tenant(fake_db):
+    request = server.UserCreate(username="field", email="field@example.com", full_name="Field", password="secret")
+
+    asyncio.run(server.register_user(request, make_user(role="admin", tenant_id="kinshasa")))
+
+    created = fake_db.users.inserted[0]
+    assert created["tenant_id"] == "kinshasa"
+    assert created["role"] == "agent"
+    assert "password" not in created
+
+
+@pytest.mark.parametrize("dependency, role", [
+    (server.get_current_admin, "agent"),
+    (server.get_current_superadmin, "agent"),
+    (server.get_current_superadmin, "admin"),
+])
+def test_role_dependencies_reject_insufficient_roles(dependency, role):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(dependency(make_user(role=role)))
+    assert excinfo.value.status_code == 403